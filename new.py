@@ -1,6 +1,14 @@
+import argparse
+import functools
+import multiprocessing
+import os
+import re
+import struct
 import sys
-import tkinter as tk
-from tkinter import filedialog, messagebox
+from itertools import starmap
+
+# Print each label as it is recorded; also set by --verbose
+VERBOSE = os.environ.get("ASSEMBLER_VERBOSE", "").lower() not in ("", "0", "false", "no", "off")
 # Opcode Mappings (5-bit)
 OPCODES = {
     "ADD": "00000", "SUB": "00001", "MUL": "00010", "DIV": "00011",
@@ -18,221 +26,287 @@ REGISTERS = {
     "R8": "1000", "R9": "1001", "R10": "1010", "R11": "1011",
     "R12": "1100", "R13": "1101", "R14": "1110", "R15": "1111"
 }
+# Tokenizer lookup tables, built once so the hot loop avoids .upper()/list scans
+_TOKEN_RE = re.compile(r"[,\s]+")
+# Integer forms of the tables above, so words are built with shifts, not strings
+OPCODES_INT = {sys.intern(k): int(v, 2) for k, v in OPCODES.items()}
+REGISTERS_INT = {k: int(v, 2) for k, v in REGISTERS.items()}
+REGISTERS_CI = REGISTERS_INT | {k.lower(): v for k, v in REGISTERS_INT.items()}
+# Operand-free field rows, shared by every branch placeholder with that opcode
+ZERO_ROWS = {op: (op, 0, 0, 0, 0, 0) for op in OPCODES_INT.values()}
+IS_ALU = frozenset({"ADD", "SUB", "MUL", "DIV", "LSL", "LSR", "ASR", "AND", "OR", "MOD", "LD", "ST"})
+
+
+def encode(op, i, rd, rs1, rs2, imm):
+    """Pack instruction fields into a 32-bit word.
+
+    parse_operands leaves imm at 0 for register forms and rs2 at 0 for
+    immediate forms, so both can be ORed in without checking the I bit.
+    """
+    return (op << 27) | (i << 26) | (rd << 22) | (rs1 << 18) | (rs2 << 14) | (imm & 0x3FFFF)
+
+# Operand schemas: the instruction field each operand fills, in order.
+# "rs2|imm" takes a register if it names one, otherwise an immediate (I bit set).
+RRR_OR_RRI = ("rd", "rs1", "rs2|imm")
+RR_OR_RI = ("rs1", "rs2|imm")
+R_RR_OR_RI = ("rd", "rs2|imm")
+R_IMM16 = ("rd", "imm16")
+R_IMM16H = ("rd", "imm16h")
+NONE = ()
+
+# Branches take a single label and are decoded by Assembler.assemble_instruction
+BRANCHES = frozenset({"BEQ", "BGT", "B", "CALL"})
+SCHEMAS = {
+    **dict.fromkeys(IS_ALU, RRR_OR_RRI),
+    "CMP": RR_OR_RI, "MOV": R_RR_OR_RI, "NOT": R_RR_OR_RI,
+    "MOVU": R_IMM16, "MOVH": R_IMM16H,
+    "RET": NONE, "NOP": NONE, "HLT": NONE, "END": NONE
+}
 
-symbol_table = {}  # Stores label addresses
-last_cmp = None
-
-
-def first_pass(lines):
-    """Record label addresses."""
-    pc=0
-    for line in lines:
-        stripped = line.strip().split("#")[0]  # Remove comments
-        if not stripped:
-            continue
-        if ":" in stripped:
-            label, rest = stripped.split(":", 1)
-            symbol_table[label.strip()] = pc & ~0b11 
-            print(f"Recorded label: {label.strip()} at address {pc}") 
-            if rest.strip():  # If there's an instruction after the label
-                pc += 4
+def _parse_imm(tok):
+    """Parse a decimal or 0x-prefixed hex immediate."""
+    try:
+        if tok.lower().lstrip("-").startswith("0x"):
+            return int(tok, 16)
+        return int(tok)
+    except ValueError:
+        raise ValueError(f"Invalid immediate: {tok}") from None
+
+def parse_operands(parts, schema):
+    """Check parts against schema and return (i, rd, rs1, rs2, imm)."""
+    if len(parts) - 1 != len(schema):
+        raise ValueError(f"{parts[0]} expects {len(schema)} operand(s), got {len(parts) - 1}")
+    i = 0
+    fields = {"rd": 0, "rs1": 0, "rs2": 0, "imm": 0}
+    for kind, tok in zip(schema, parts[1:]):
+        if kind == "imm16":
+            i, fields["imm"] = 1, _parse_imm(tok) & 0xFFFF
+        elif kind == "imm16h":  # 'h' modifier (bits 17:16 = 10): load into the upper half
+            i, fields["imm"] = 1, 0x20000 | (_parse_imm(tok) & 0xFFFF)
+        elif tok in REGISTERS_CI:
+            fields["rs2" if kind == "rs2|imm" else kind] = REGISTERS_CI[tok]
+        elif kind == "rs2|imm":
+            i, fields["imm"] = 1, _parse_imm(tok)
         else:
-            pc += 4
-
-def format_binary(opcode, i, rd, rs1, rs2, imm):
-    if imm is not None:
-        imm_bin = format(int(imm) & 0x3FFFF, '018b')
-        return f"{opcode}{i}{rd}{rs1}{imm_bin}"
-    else:
-        return f"{opcode}{i}{rd}{rs1}{rs2}{'0'*14}"
-
-def assemble_instruction(line, pc):
-    global last_cmp
-    parts = line.replace(",", "").split()
-    if not parts:
-        return None
-    if parts[0].endswith(":"):
-        parts.pop(0)
-        if not parts:
-            return None  
-    inst = parts[0]
-    if inst not in OPCODES:
-        raise ValueError(f"Unknown instruction: {inst}")
-    opcode = OPCODES[inst]
-
-    if inst in ["ADD", "SUB", "MUL", "DIV", "LSL", "LSR", "ASR", "AND", "OR", "MOD","LD", "ST"]:
-        if len(parts) == 4 and parts[3].lstrip('-').isdigit():
-            rd, rs1 = REGISTERS.get(parts[1].upper()), REGISTERS.get(parts[2].upper())
-            imm = int(parts[3]) & 0x3FFFF
-            return format_binary(opcode, "1", rd, rs1, "0000", imm)
-        elif len(parts) == 4:
-            rd, rs1, rs2 = REGISTERS.get(parts[1].upper()), REGISTERS.get(parts[2].upper()), REGISTERS.get(parts[3].upper())
-            return format_binary(opcode, "0", rd, rs1, rs2, None)
-
-    elif inst == "CMP":
-        if len(parts) == 3 and parts[2].lstrip('-').isdigit():
-            rs1 = REGISTERS.get(parts[1].upper())
-            imm = int(parts[2]) & 0x3FFFF
-            last_cmp = (rs1, str(imm))  # Ensure last_cmp stores the immediate value
-            return format_binary(opcode, "1",  "0000",rs1, "0000", imm)
-        elif len(parts) == 3:
-            rs1, rs2 = REGISTERS.get(parts[1].upper()), REGISTERS.get(parts[2].upper())
-            last_cmp = (rs1, rs2)
-            return format_binary(opcode, "0", "0000",rs1, rs2, None)
-
-    elif inst in ["NOT", "MOV"]:
-        if len(parts) == 3 and parts[2].lstrip('-').isdigit():
-            rd = REGISTERS.get(parts[1].upper())
-            imm = int(parts[2]) & 0x3FFFF
-            return format_binary(opcode, "1", rd, "0000", "0000", imm)
-        elif len(parts) == 3:
-            rd, rs1 = REGISTERS.get(parts[1].upper()), REGISTERS.get(parts[2].upper())
-            return format_binary(opcode, "0", rd,  "0000",rs1, None)
-
-    elif inst in ["MOVU", "MOVH"]:
-        if len(parts) == 3:
-            rd = REGISTERS.get(parts[1].upper())
-        
-            imm_str = parts[2].strip()
-            if imm_str.startswith('0x'):  # Handle hexadecimal values
-                imm = int(imm_str, 16)  # Convert hex value to integer
-            else:  # Handle decimal values
-                imm = int(imm_str)  # Convert decimal value to integer
-        
-            # Handle MOVU (unsigned)
-            if inst == "MOVU":
-                imm &= 0xFFFF  # Ensure it's a 16-bit value
-                return format_binary(opcode, "1", rd, "0000", "0000", imm)
-        
-            # Handle MOVH (left shift by 16)
-            else:
-                inst == "MOVH"
-                imm = (imm << 16) & 0x3FFFF  # Left shift by 16 and mask
-                return format_binary(opcode, "1", rd, "0000", "0000", imm)
-        
-    
-    elif inst in ["BEQ", "BGT"]:
-        if len(parts) != 2:  # BEQ should have exactly one argument (a label)
-            raise ValueError(f"Invalid syntax for {inst}: {line}")
-
-        if last_cmp is None:
-            raise ValueError(f"{inst} must follow a CMP instruction.")
-        
-        target_address = symbol_table.get(parts[1], 0)
-
-        offset=(target_address - (pc + 4))
-        
-        address=format(offset & 0x7FFFFFF, '027b') 
-        return f"{opcode}{address}" 
-
-    elif inst in ["B", "CALL"]:
-        if len(parts) == 2:
-            target_address = symbol_table.get(parts[1], 0)
-            offset = (target_address - (pc + 4))
-            address = format(offset & 0x7FFFFFF, '027b')
-            return f"{opcode}{address}"
-    
-    elif inst in ["RET", "NOP", "HLT", "END"]:
-        return f"{opcode}000000000000000000000000000"
-
-    raise ValueError(f"Invalid instruction format: {line}")
-
-def assemble_file(input_file, output_bin_file, output_hex_file):
-    global pc
-    with open(input_file, "r") as infile:
-        lines = infile.readlines()
-
-    first_pass(lines)
-    
-    with open(output_bin_file, "w") as binfile, open(output_hex_file, "w") as hexfile:
-        pc=0
-        for line in lines:
+            raise ValueError(f"Unknown register: {tok}")
+    return i, fields["rd"], fields["rs1"], fields["rs2"], fields["imm"]
+
+@functools.lru_cache(maxsize=4096)
+def _assemble_pc_independent(parts):
+    """Decode a non-branch instruction from its token tuple (memoized)."""
+    schema = SCHEMAS.get(parts[0])
+    if schema is None:
+        raise ValueError(f"Unknown instruction: {parts[0]}")
+    return (OPCODES_INT[parts[0]], *parse_operands(parts, schema))
+
+def prepare_lines(lines):
+    """Strip comments, split off labels and tokenize every line once."""
+    prepared = []
+    for line in lines:
+        code = line.split("#", 1)[0]  # Remove comments
+        label = None
+        if ":" in code:
+            label, code = code.split(":", 1)
+            label = sys.intern(label.strip())
+        prepared.append((tuple(p for p in _TOKEN_RE.split(code) if p), label))
+    return prepared
+
+class Assembler:
+    """Per-program assembler state: labels, the last CMP and the pc."""
+
+    def __init__(self):
+        self.symbols = {}  # Stores label addresses
+        self.last_cmp = None
+        self.pc = 0
+
+    def assemble_instruction(self, parts):
+        """Decode a tokenized instruction into fields (or a branch patch record)."""
+        inst = parts[0]
+        if inst in BRANCHES:
+            if inst in ("BEQ", "BGT") and self.last_cmp is None:
+                raise ValueError(f"{inst} must follow a CMP instruction.")
+            if len(parts) != 2:
+                raise ValueError(f"{inst} expects 1 operand(s), got {len(parts) - 1}")
+            # Offset is patched in once all labels are known
+            return ("PATCH", OPCODES_INT[inst], self.pc, sys.intern(parts[1]))
+        fields = _assemble_pc_independent(parts)
+        if inst == "CMP":
+            self.last_cmp = parts[1:]
+        return fields
+
+    def assemble_file(self, input_file, output_bin_file, output_hex_file, binary_mode=False):
+        """Decode every line to instruction fields, then encode them in one batch.
+
+        With binary_mode the .bin file holds packed little-endian 32-bit words
+        instead of one line of 0/1 text per instruction.
+        """
+        with open(input_file, "r") as infile:
+            lines = infile.read().splitlines()
+
+        fields = []
+        patches = []  # (fields index, pc, label) of branches
+
+        self.symbols = {}
+        self.last_cmp = None
+        self.pc = 0
+        for line, (parts, label) in zip(lines, prepare_lines(lines)):
+            if label is not None:
+                self.symbols[label] = self.pc
+                if VERBOSE:
+                    print(f"Recorded label: {label} at address {self.pc}")
+            if not parts:
+                continue
             try:
-                binary_code = assemble_instruction(line, pc)
-                if binary_code:
-                    binfile.write(binary_code + "\n")
-                    hex_code = format(int(binary_code, 2), '08X')  # Convert to hex
-                    hexfile.write(hex_code + "\n")
-
-                    pc+=4
-                
-            except ValueError as e:
-                print(f"Error: {e}\nLine: {line.strip()}")
-                sys.exit(1)
+                row = self.assemble_instruction(parts)
+                if row[0] == "PATCH":
+                    _, opcode, _, label = row
+                    patches.append((len(fields), self.pc, label))
+                    row = ZERO_ROWS[opcode]
+                fields.append(row)
+                self.pc += 4
 
-import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext
+            except ValueError as e:
+                raise ValueError(f"{e}\nLine: {line.strip()}") from None
+
+        words = list(starmap(encode, fields))
+        for index, pc, label in patches:
+            if label not in self.symbols:
+                raise ValueError(f"Undefined label '{label}' (branch at address {pc})")
+            offset = self.symbols[label] - (pc + 4)
+            words[index] |= offset & 0x7FFFFFF
+
+        # One write per file instead of one per instruction
+        if binary_mode:
+            with open(output_bin_file, "wb") as binfile:
+                binfile.write(struct.pack(f"<{len(words)}I", *words))
+        else:
+            with open(output_bin_file, "w") as binfile:
+                binfile.write("".join([f"{word:032b}\n" for word in words]))
+        with open(output_hex_file, "w") as hexfile:
+            hexfile.write("".join([f"{word:08X}\n" for word in words]))
+
+def _assemble_one(input_file, output_bin_file, output_hex_file, binary_mode=False):
+    Assembler().assemble_file(input_file, output_bin_file, output_hex_file, binary_mode)
+
+def _set_verbose(verbose):
+    global VERBOSE
+    VERBOSE = verbose
+
+def assemble_many(jobs_list, processes=None, binary_mode=False):
+    """Assemble (input, bin, hex) triples in parallel, one fresh Assembler per file."""
+    with multiprocessing.Pool(processes, initializer=_set_verbose, initargs=(VERBOSE,)) as pool:
+        pool.starmap(_assemble_one, [(*job, binary_mode) for job in jobs_list])
+
+def main_gui():
+    """Build and run the Tk front end; tkinter is only imported here."""
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, scrolledtext
+
+    def run_assembler(input_file, output_bin_file,output_hex_file):
+        try:
+            Assembler().assemble_file(input_file, output_bin_file,output_hex_file)
+            messagebox.showinfo("Success", f"Assembly completed! Output saved to {output_bin_file}")
+            return True
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return False
+
+    def open_file():
+        file_path = filedialog.askopenfilename(filetypes=[("Assembly Files", ".asm"), ("All Files", ".*")])
+        if file_path:
+            with open(file_path, "r") as file:
+                input_text.delete(1.0, tk.END)
+                input_text.insert(tk.END, file.read())
+
+    def save_output():
+        file_path = filedialog.asksaveasfilename(filetypes=[("Binary Files", ".bin"), ("All Files", ".*")], defaultextension=".bin")
+        if file_path:
+            with open(file_path, "w") as file:
+                file.write(output_text.get(1.0, tk.END))
+            messagebox.showinfo("Saved", f"Output saved to {file_path}")
+
+    def assemble():
+        temp_input = "temp_input.asm"
+        temp_output_bin = "temp_output.bin"
+        temp_output_hex = "temp_output.hex"
+
+        with open(temp_input, "w") as file:
+            file.write(input_text.get(1.0, tk.END))
 
-def run_assembler(input_file, output_bin_file,output_hex_file):
-    try:
-        assemble_file(input_file, output_bin_file,output_hex_file)
-        messagebox.showinfo("Success", f"Assembly completed! Output saved to {output_bin_file}")
-    except Exception as e:
-        messagebox.showerror("Error", str(e))
-
-def open_file():
-    file_path = filedialog.askopenfilename(filetypes=[("Assembly Files", ".asm"), ("All Files", ".*")])
-    if file_path:
-        with open(file_path, "r") as file:
-            input_text.delete(1.0, tk.END)
-            input_text.insert(tk.END, file.read())
-
-def save_output():
-    file_path = filedialog.asksaveasfilename(filetypes=[("Binary Files", ".bin"), ("All Files", ".*")], defaultextension=".bin")
-    if file_path:
-        with open(file_path, "w") as file:
-            file.write(output_text.get(1.0, tk.END))
-        messagebox.showinfo("Saved", f"Output saved to {file_path}")
-
-def assemble():
-    temp_input = "temp_input.asm"
-    temp_output_bin = "temp_output.bin"
-    temp_output_hex = "temp_output.hex"
-    
-    with open(temp_input, "w") as file:
-        file.write(input_text.get(1.0, tk.END))
-
-    run_assembler(temp_input, temp_output_bin, temp_output_hex)
-    
-    with open(temp_output_bin, "r") as file:
         output_text.delete(1.0, tk.END)
-        output_text.insert(tk.END, file.read())
-
-# GUI Setup
-root = tk.Tk()
-root.title("GUI Assembler")
-root.configure(bg="#1E1E1E")  # Dark background
-
-frame = tk.Frame(root, padx=10, pady=10, bg="#1E1E1E")
-frame.pack(padx=10, pady=10)
-
-# Input and Output Text Areas
-input_text = scrolledtext.ScrolledText(frame, width=50, height=15, bg="#252526", fg="white", insertbackground="white")
-input_text.grid(row=0, column=0, padx=5, pady=5)
-
-output_text = scrolledtext.ScrolledText(frame, width=50, height=15, bg="#252526", fg="white", insertbackground="white")
-output_text.grid(row=0, column=1, padx=5, pady=5)
-
-# Buttons
-btn_frame = tk.Frame(root, bg="#1E1E1E")
-btn_frame.pack(pady=10)
-
-btn_assemble = tk.Button(btn_frame, text="Assemble", command=assemble, bg="#4F46E5", fg="white", width=10)
-btn_assemble.grid(row=0, column=0, padx=5)
-
-btn_open = tk.Button(btn_frame, text="Open File", command=open_file, bg="#22C55E", fg="white", width=10)
-btn_open.grid(row=0, column=1, padx=5)
-
-btn_save = tk.Button(btn_frame, text="Save Output", command=save_output, bg="#DC2626", fg="white", width=10)
-btn_save.grid(row=0, column=2, padx=5)
-
-root.mainloop()
-
-
-
-if _name== "_main":
-    if len(sys.argv) != 3:
-        print("Usage: python3 modifier.py input.asm output.bin")
+        # Output files are only written on success; don't show a stale binary
+        if run_assembler(temp_input, temp_output_bin, temp_output_hex):
+            with open(temp_output_bin, "r") as file:
+                output_text.insert(tk.END, file.read())
+
+    # GUI Setup
+    root = tk.Tk()
+    root.title("GUI Assembler")
+    root.configure(bg="#1E1E1E")  # Dark background
+
+    frame = tk.Frame(root, padx=10, pady=10, bg="#1E1E1E")
+    frame.pack(padx=10, pady=10)
+
+    # Input and Output Text Areas
+    input_text = scrolledtext.ScrolledText(frame, width=50, height=15, bg="#252526", fg="white", insertbackground="white")
+    input_text.grid(row=0, column=0, padx=5, pady=5)
+
+    output_text = scrolledtext.ScrolledText(frame, width=50, height=15, bg="#252526", fg="white", insertbackground="white")
+    output_text.grid(row=0, column=1, padx=5, pady=5)
+
+    # Buttons
+    btn_frame = tk.Frame(root, bg="#1E1E1E")
+    btn_frame.pack(pady=10)
+
+    btn_assemble = tk.Button(btn_frame, text="Assemble", command=assemble, bg="#4F46E5", fg="white", width=10)
+    btn_assemble.grid(row=0, column=0, padx=5)
+
+    btn_open = tk.Button(btn_frame, text="Open File", command=open_file, bg="#22C55E", fg="white", width=10)
+    btn_open.grid(row=0, column=1, padx=5)
+
+    btn_save = tk.Button(btn_frame, text="Save Output", command=save_output, bg="#DC2626", fg="white", width=10)
+    btn_save.grid(row=0, column=2, padx=5)
+
+    root.mainloop()
+
+
+def _positive_int(value):
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return n
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Assemble .asm files; starts the GUI when no files are given.")
+    parser.add_argument("files", nargs="*", metavar="FILE",
+                        help="input.asm output.bin output.hex, repeated once per program")
+    parser.add_argument("-j", "--jobs", type=_positive_int, default=1,
+                        help="number of files to assemble in parallel (default: 1)")
+    parser.add_argument("--binary-mode", action="store_true",
+                        help="write .bin files as packed little-endian 32-bit words")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print each label as it is recorded (or set ASSEMBLER_VERBOSE=1)")
+    args = parser.parse_args(argv)
+    if args.verbose:
+        _set_verbose(True)
+
+    if not args.files:
+        main_gui()
+        return
+    if len(args.files) % 3:
+        parser.error("files must be given as input.asm output.bin output.hex triples")
+
+    jobs_list = [tuple(args.files[i:i + 3]) for i in range(0, len(args.files), 3)]
+    try:
+        if args.jobs > 1 and len(jobs_list) > 1:
+            assemble_many(jobs_list, args.jobs, args.binary_mode)
+        else:
+            for job in jobs_list:
+                _assemble_one(*job, args.binary_mode)
+    except ValueError as e:
+        print(f"Error: {e}")
         sys.exit(1)
 
-    assemble_file(sys.argv[1], sys.argv[2])
\ No newline at end of file
+
+if __name__ == "__main__":
+    main()